@@ -0,0 +1,78 @@
+"""
+Numerical kernels for incident bounds and nearest-center search.
+
+With numba installed, the kernels are compiled to native loops with
+@njit(cache=True) (compiled code is cached on disk, so only the very first
+call pays the compile cost). Without numba, equivalent vectorized NumPy
+implementations are used. Both variants expect contiguous float64 arrays,
+not Python lists of lists.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+
+if njit is not None:
+
+    @njit(cache=True)
+    def bounds_kernel(coords):
+        """
+        Return (min_x, min_y, max_x, max_y) of an (N, 2) float64 coordinate array.
+        """
+        min_x = max_x = coords[0, 0]
+        min_y = max_y = coords[0, 1]
+        for i in range(1, coords.shape[0]):
+            x = coords[i, 0]
+            y = coords[i, 1]
+            if x < min_x:
+                min_x = x
+            elif x > max_x:
+                max_x = x
+            if y < min_y:
+                min_y = y
+            elif y > max_y:
+                max_y = y
+        return min_x, min_y, max_x, max_y
+
+    @njit(cache=True)
+    def nearest_kernel(centers, lat, lon):
+        """
+        Return (index, squared distance) of the row of an (N, 2) float64 array of
+        (lat, lon) centers closest to (lat, lon); (-1, inf) when N == 0.
+        """
+        best = -1
+        best_d2 = np.inf
+        for i in range(centers.shape[0]):
+            dy = centers[i, 0] - lat
+            dx = centers[i, 1] - lon
+            d2 = dx * dx + dy * dy
+            if d2 < best_d2:
+                best_d2 = d2
+                best = i
+        return best, best_d2
+
+else:
+
+    def bounds_kernel(coords):
+        """
+        Return (min_x, min_y, max_x, max_y) of an (N, 2) float64 coordinate array.
+        """
+        min_x, min_y = coords.min(axis=0).tolist()
+        max_x, max_y = coords.max(axis=0).tolist()
+        return min_x, min_y, max_x, max_y
+
+    def nearest_kernel(centers, lat, lon):
+        """
+        Return (index, squared distance) of the row of an (N, 2) float64 array of
+        (lat, lon) centers closest to (lat, lon); (-1, inf) when N == 0.
+        """
+        if centers.shape[0] == 0:
+            return -1, np.inf
+        dy = centers[:, 0] - lat
+        dx = centers[:, 1] - lon
+        d2 = dx * dx + dy * dy
+        i = int(d2.argmin())
+        return i, float(d2[i])
@@ -25,7 +25,7 @@ from utils.utils import (
     icon_for_feature,
     normalize_muni_properties,
     split_incidents,
-    muni_passes,
+    make_muni_filter,
 )
 
 # -------------------------- Manitoba Boundary Function --------------------------
@@ -285,6 +285,9 @@ def home_page():
             if st.button("🔄 Reset to Default Data", type="secondary", use_container_width=True):
                 st.session_state.incidents_data = load_default_incidents()
                 st.session_state.incidents_source = "default"
+                # Rebuilt lazily by the report page on the next upload
+                st.session_state.pop('incident_signatures', None)
+                st.session_state.incidents_version = st.session_state.get('incidents_version', 0) + 1
                 if 'upload_history' in st.session_state:
                     del st.session_state.upload_history
                 st.success("Reset to default incident data!")
@@ -305,7 +308,8 @@ def home_page():
         sel_status = st.multiselect("Status", options=statuses, default=statuses)
         sel_pop = st.slider("Population (2021) range", min_value=0, max_value=pop_max, value=(pop_min, pop_max), step=1)
 
-        muni_filtered = [f for f in muni_feats if muni_passes(f, sel_status, sel_pop)]
+        keep_muni = make_muni_filter(sel_status, sel_pop)
+        muni_filtered = [f for f in muni_feats if keep_muni(f)]
         st.write(f"**Selected places:** {len(muni_filtered)} / {len(muni_feats)}")
         
         # Display warnings when no municipalities are selected
@@ -6,20 +6,25 @@ Key Features:
 2. Zoom-to-feature on marker/polygon clicks
 3. Seamless user experience with retained map context
 """
-import json
 import os
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
+try:
+    from folium.plugins import VectorGridProtobuf
+except ImportError:  # folium < 0.15; municipalities are then always drawn as GeoJSON
+    VectorGridProtobuf = None
 import osmnx as ox
 import geopandas as gpd
 import numpy as np
+from shapely.geometry import shape
 
 # Import helpers from utils folder
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.utils import (
+    load_json,
     iter_coords,
     get_bounds,
     centroid_of_feature,
@@ -29,9 +34,19 @@ from utils.utils import (
     icon_for_feature,
     normalize_muni_properties,
     split_incidents,
-    muni_passes,
+    build_muni_index,
+    muni_filter_mask,
+    build_muni_tree,
+    munis_at_point,
 )
 
+# Optional vector tile (MVT) source for municipality boundaries, e.g. served by
+# mbtileserver from `tippecanoe -o muni.mbtiles -l municipalities -zg data/mb_with_winnipeg.geojson`.
+# When set, Leaflet fetches only the tiles in view instead of the full GeoJSON.
+MUNI_TILES_URL = os.environ.get("MUNI_TILES_URL")
+MUNI_TILES_LAYER = os.environ.get("MUNI_TILES_LAYER", "municipalities")
+USE_MUNI_TILES = bool(MUNI_TILES_URL) and VectorGridProtobuf is not None
+
 # -------------------------- Map State Management --------------------------
 
 def initialize_map_state():
@@ -66,27 +81,32 @@ def calculate_feature_bounds(feature):
     if not geom:
         return None
     
-    coords = []
-    for lon, lat in iter_coords(geom):
-        coords.append([lat, lon])
-    
-    if not coords:
+    coords = np.array(list(iter_coords(geom)), dtype=np.float64)
+    if coords.size == 0:
         return None
     
-    lats = [c[0] for c in coords]
-    lons = [c[1] for c in coords]
+    # Column order is (lon, lat)
+    mins = coords.min(axis=0)
+    maxs = coords.max(axis=0)
     
-    # Calculate bounds with some padding
-    lat_padding = (max(lats) - min(lats)) * 0.1 or 0.01
-    lon_padding = (max(lons) - min(lons)) * 0.1 or 0.01
+    # Calculate bounds with some padding (at least 0.01 degrees per axis)
+    pad = np.maximum((maxs - mins) * 0.1, 0.01)
+    south_west = mins - pad
+    north_east = maxs + pad
     
     return [
-        [min(lats) - lat_padding, min(lons) - lon_padding],  # Southwest
-        [max(lats) + lat_padding, max(lons) + lon_padding]   # Northeast
+        [float(south_west[1]), float(south_west[0])],  # Southwest
+        [float(north_east[1]), float(north_east[0])]   # Northeast
     ]
 
-def find_clicked_feature(clicked_lat, clicked_lng, muni_features, wf_features, fl_features):
-    """Find which feature was clicked based on coordinates"""
+def find_clicked_feature(clicked_lat, clicked_lng, muni_feats, muni_mask, wf_features, fl_features):
+    """
+    Find which feature was clicked based on coordinates.
+
+    Municipalities are looked up exactly through the cached STRtree (only those
+    selected by muni_mask count, or all of them if muni_mask is None); incidents
+    use the bounds/centroid heuristic.
+    """
     
     def point_in_polygon_bounds(lat, lng, feature):
         """Check if point is roughly within feature bounds (simplified)"""
@@ -94,38 +114,48 @@ def find_clicked_feature(clicked_lat, clicked_lng, muni_features, wf_features, f
         if not geom:
             return False, float('inf')
         
-        # Get feature centroid
-        center_lat, center_lon = centroid_of_feature(feature)
+        # Build the geometry once; bounds and centroid both come from GEOS
+        try:
+            g = shape(geom)
+        except (ValueError, TypeError, AttributeError):
+            return False, float('inf')
+        if g.is_empty:
+            return False, float('inf')
+        min_lon, min_lat, max_lon, max_lat = g.bounds
         
-        # Calculate distance from click to centroid
+        # Distance from click to the centroid the incident marker is drawn at
+        # (the same GEOS centroid centroid_of_feature returns)
+        c = g.centroid
+        center_lat, center_lon = c.y, c.x
         distance = np.sqrt((lat - center_lat)**2 + (lng - center_lon)**2)
         
-        # For polygons, check if click is within reasonable bounds
-        coords = list(iter_coords(geom))
-        if coords:
-            lats = [c[1] for c in coords]
-            lons = [c[0] for c in coords]
-            lat_range = max(lats) - min(lats)
-            lon_range = max(lons) - min(lons)
-            max_range = max(lat_range, lon_range)
-            
-            # Consider it a match if within the feature's bounding area
-            if (min(lats) <= lat <= max(lats) and 
-                min(lons) <= lng <= max(lons)):
-                return True, distance
-            
-            # Or if very close to centroid (for markers)
-            if distance < max(0.05, max_range * 0.5):
-                return True, distance
+        # Consider it a match if within the feature's bounding area
+        if min_lat <= lat <= max_lat and min_lon <= lng <= max_lon:
+            return True, distance
+        
+        # Or if very close to centroid (for markers)
+        max_range = max(max_lat - min_lat, max_lon - min_lon)
+        if distance < max(0.05, max_range * 0.5):
+            return True, distance
         
         return False, distance
     
     best_feature = None
     best_distance = float('inf')
-    
-    # Check all feature types
+
+    # Municipalities containing the click, ranked by distance to their centroid
+    muni_tree, muni_geoms = _muni_tree_cached(muni_feats)
+    for i in munis_at_point(muni_tree, clicked_lat, clicked_lng):
+        if muni_mask is not None and not muni_mask[i]:
+            continue
+        c = muni_geoms[i].centroid
+        distance = np.hypot(clicked_lat - c.y, clicked_lng - c.x)
+        if distance < best_distance:
+            best_distance = distance
+            best_feature = (muni_feats[i], 'municipality')
+    
+    # Check incident feature types
     all_features = [
-        (muni_features, 'municipality'),
         (wf_features, 'wildfire'),
         (fl_features, 'flood')
     ]
@@ -177,11 +207,10 @@ def add_manitoba_mask(m, manitoba_gdf):
     
     manitoba_geom = manitoba_gdf.geometry.iloc[0]
     
-    if hasattr(manitoba_geom, 'exterior'):
-        manitoba_coords = [[list(coord)[::-1] for coord in manitoba_geom.exterior.coords]]
-    else:
-        largest = max(manitoba_geom.geoms, key=lambda x: x.area)
-        manitoba_coords = [[list(coord)[::-1] for coord in largest.exterior.coords]]
+    if not hasattr(manitoba_geom, 'exterior'):
+        manitoba_geom = max(manitoba_geom.geoms, key=lambda x: x.area)
+    # Exterior ring as GeoJSON (lon, lat) positions; no per-vertex Python swapping
+    manitoba_ring = np.asarray(manitoba_geom.exterior.coords, dtype=np.float64)[:, :2].tolist()
     
     mask_geojson = {
         "type": "Feature",
@@ -190,7 +219,7 @@ def add_manitoba_mask(m, manitoba_gdf):
             "type": "Polygon",
             "coordinates": [
                 [[-180, -90], [180, -90], [180, 90], [-180, 90], [-180, -90]],
-                [coord[::-1] for coord in manitoba_coords[0]]
+                manitoba_ring
             ]
         }
     }
@@ -229,12 +258,79 @@ def add_manitoba_mask(m, manitoba_gdf):
         name="Manitoba Boundary"
     ).add_to(m)
 
+def _split_cached(incidents_data, status_filter):
+    """
+    Memoize split_incidents per session, reusing the previous split while the
+    incidents object and the status filter are unchanged (e.g. on pan/zoom reruns)
+    """
+    key = tuple(status_filter)
+    cached = st.session_state.get('_split_incidents_cache')
+    if cached and cached[0] is incidents_data and cached[1] == key:
+        return cached[2]
+    result = split_incidents(incidents_data, list(key))
+    st.session_state._split_incidents_cache = (incidents_data, key, result)
+    return result
+
+def _muni_tree_cached(muni_feats):
+    """
+    Memoize build_muni_tree per session while the municipality features list
+    is unchanged (it comes from the cached load_municipalities)
+    """
+    cached = st.session_state.get('_muni_tree_cache')
+    if cached and cached[0] is muni_feats:
+        return cached[1]
+    result = build_muni_tree(muni_feats)
+    st.session_state._muni_tree_cache = (muni_feats, result)
+    return result
+
+def _popup_fields(props, kind, merged):
+    """Return (name, confidence, popup html) for an incident marker"""
+    name = props.get("name", kind)
+    conf = (props.get("status") or props.get("confidence") or "unknown").title()
+    source_indicator = " [User Added]" if merged and props.get("user_added", False) else ""
+    html = (f"<b>{name}{source_indicator}</b><br>Type: {kind}<br>Confidence: {conf}"
+            f"<br>Started: {props.get('started_at', '')}<br>Details: {props.get('description', '')}"
+            f"<br><i>Click to zoom to this feature</i>")
+    return name, conf, html
+
+def build_popups(features, kind, merged):
+    """
+    Pre-build marker (name, confidence, popup html) tuples for a list of incident
+    features, memoized per session while the features list is unchanged
+    """
+    cache = st.session_state.setdefault('_popup_cache', {})
+    cached = cache.get(kind)
+    if cached and cached[0] is features and cached[1] == merged:
+        return cached[2]
+    popups = [_popup_fields(f.get("properties", {}), kind, merged) for f in features]
+    cache[kind] = (features, merged, popups)
+    return popups
+
+def _style_from_props(feature):
+    """Shared style_function for incident polygons (style_for_feature memoizes per type/status)"""
+    return style_for_feature(feature.get('properties') or {})
+
+@st.cache_resource
+def load_municipalities(path):
+    """
+    Load and normalize the municipality features once per process.
+
+    Returns the features, their column index from build_muni_index (status and
+    2021 population arrays aligned with the features, NaN for non-numeric
+    populations) and the sorted status options.
+    """
+    muni_feats = load_json(path).get("features", [])
+    normalize_muni_properties(muni_feats)
+    muni_index = build_muni_index(muni_feats)
+    statuses = sorted(set(muni_index["status"]))
+    return muni_feats, muni_index, statuses
+
+@st.cache_data(show_spinner=False)
 def load_default_incidents():
-    """Load the default incidents data from file"""
+    """Load the default incidents data from file (cached; each call returns its own copy)"""
     inc_default = "data/incidents_dummy.geojson"
     if os.path.exists(inc_default):
-        with open(inc_default, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(inc_default)
     return {"type": "FeatureCollection", "features": []}
 
 def create_metric_card_html():
@@ -317,6 +413,180 @@ def create_metric_card_html():
     </style>
     """
 
+# -------------------------- Map Fragment --------------------------
+
+@st.fragment
+def map_fragment(manitoba_boundary, show_mask, muni_feats, muni_mask, muni_filtered,
+                 wf_features, fl_features, show_wf, show_fl, fire_svg_icon, flood_svg_icon):
+    """
+    Build, render and handle interactions for the main map.
+
+    Runs as a Streamlit fragment so pans, zooms and click-to-zoom only re-execute
+    the map, not the boundary fetch, file loads and sidebar of the whole page.
+    """
+    # Display current map state info (for debugging/user feedback)
+    if st.session_state.map_state['last_clicked_feature']:
+        clicked_info = st.session_state.map_state['last_clicked_feature']
+        st.info(f"🎯 Currently focused on: {clicked_info['name']} ({clicked_info['type']})")
+
+    # Use stored map state for center and zoom
+    map_center = st.session_state.map_state['center']
+    map_zoom = st.session_state.map_state['zoom']
+    
+    # Initialize map with persisted state
+    m = folium.Map(
+        location=map_center, 
+        zoom_start=map_zoom, 
+        control_scale=True, 
+        tiles="OpenStreetMap"
+    )
+
+    # Add Manitoba mask if enabled
+    if show_mask and manitoba_boundary is not None:
+        add_manitoba_mask(m, manitoba_boundary)
+
+    # Add municipalities layer only if there are filtered municipalities
+    # Vector tiles carry the full municipality set: when at least one municipality
+    # passes the sidebar filters, every municipality is drawn (the filters then only
+    # affect the metrics); when none pass, no boundaries are drawn, as in GeoJSON mode
+    show_muni_tiles = USE_MUNI_TILES and len(muni_filtered) > 0
+    if show_muni_tiles:
+        VectorGridProtobuf(
+            MUNI_TILES_URL,
+            "Municipal Boundaries",
+            {"vectorTileLayerStyles": {MUNI_TILES_LAYER: {
+                "fill": True, "fillOpacity": 0.35, "weight": 2, "color": "#64748b"
+            }}},
+        ).add_to(m)
+    elif len(muni_filtered) > 0:
+        muni_popup = folium.GeoJsonPopup(
+            fields=["name", "status", "population_2021"],
+            aliases=["Name", "Status", "Population (2021)"],
+            localize=True,
+            labels=True,
+            style="background-color:white; font-size:14px;"
+        )
+        muni_tooltip = folium.GeoJsonTooltip(
+            fields=["name", "status", "population_2021"],
+            aliases=["Name", "Status", "Population (2021)"],
+            localize=True,
+            sticky=False,
+        )
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": muni_filtered},
+            name="Municipal Boundaries",
+            style_function=make_muni_style,
+            tooltip=muni_tooltip,
+            popup=muni_popup,
+            highlight_function=lambda x: {"weight": 3},
+        ).add_to(m)
+
+    # Add wildfire markers
+    if show_wf:
+        wf_layer = folium.FeatureGroup(name="Wildfires", show=True)
+        wf_popups = build_popups(wf_features, "Wildfire", st.session_state.incidents_source == "merged")
+        for f, (name, conf, html) in zip(wf_features, wf_popups):
+            props = f.get("properties", {})
+            # Polygon
+            folium.GeoJson(
+                f,
+                style_function=_style_from_props,
+                highlight_function=lambda x: {"weight": 3}
+            ).add_to(wf_layer)
+            # Marker at centroid
+            lat, lon = centroid_of_feature(f)
+            folium.Marker(
+                location=(lat, lon),
+                icon=icon_for_feature(props, fire_icon=fire_svg_icon),
+                tooltip=f"{name} • {conf}",
+                popup=folium.Popup(html, max_width=350)
+            ).add_to(wf_layer)
+        wf_layer.add_to(m)
+
+    # Add flood markers
+    if show_fl:
+        fl_layer = folium.FeatureGroup(name="Floods", show=True)
+        fl_popups = build_popups(fl_features, "Flood", st.session_state.incidents_source == "merged")
+        for f, (name, conf, html) in zip(fl_features, fl_popups):
+            props = f.get("properties", {})
+            # Polygon
+            folium.GeoJson(
+                f,
+                style_function=_style_from_props,
+                highlight_function=lambda x: {"weight": 3}
+            ).add_to(fl_layer)
+            # Marker at centroid
+            lat, lon = centroid_of_feature(f)
+            folium.Marker(
+                location=(lat, lon),
+                icon=icon_for_feature(props, flood_icon=flood_svg_icon),
+                tooltip=f"{name} • {conf}",
+                popup=folium.Popup(html, max_width=350)
+            ).add_to(fl_layer)
+        fl_layer.add_to(m)
+
+    # Apply bounds if zooming to feature
+    if st.session_state.map_state['zoom_to_feature'] and st.session_state.map_state['bounds']:
+        m.fit_bounds(st.session_state.map_state['bounds'])
+        # Reset the zoom_to_feature flag after applying
+        st.session_state.map_state['zoom_to_feature'] = False
+    else:
+        # Fit map bounds based on available data only if no specific zoom target
+        if manitoba_boundary is not None and show_mask and not st.session_state.map_state['last_clicked_feature']:
+            bounds = manitoba_boundary.total_bounds
+            m.fit_bounds([[bounds[1], bounds[0]], [bounds[3], bounds[2]]])
+        elif not st.session_state.map_state['last_clicked_feature']:
+            # Determine what features to use for bounds
+            if muni_filtered:
+                feats_for_bounds = muni_filtered
+            elif show_wf and wf_features:
+                feats_for_bounds = wf_features
+            elif show_fl and fl_features:
+                feats_for_bounds = fl_features
+            else:
+                feats_for_bounds = []
+            
+            if feats_for_bounds:
+                south_west, north_east = get_bounds(feats_for_bounds)
+                m.fit_bounds([south_west, north_east])
+
+    # Add layer control
+    folium.LayerControl(collapsed=True).add_to(m)
+    
+    # Render map and capture interactions
+    map_data = st_folium(
+        m, 
+        width=None, 
+        height=720, 
+        key="main_map",
+        returned_objects=["last_object_clicked", "center", "zoom", "bounds"]
+    )
+
+    # -------------------------- Handle Map Interactions --------------------------
+    
+    # Update map state from user interaction (pan/zoom)
+    if map_data:
+        update_map_state_from_interaction(map_data)
+    
+    # Handle clicks on features (markers/polygons)
+    if map_data and map_data.get('last_object_clicked'):
+        clicked_lat = map_data['last_object_clicked']['lat']
+        clicked_lng = map_data['last_object_clicked']['lng']
+        
+        # Find which feature was clicked
+        # Clickable municipalities are exactly the drawn ones: all of them when
+        # tiles are shown, otherwise those selected by the sidebar filters
+        click_mask = None if show_muni_tiles else muni_mask
+        clicked_feature_info = find_clicked_feature(
+            clicked_lat, clicked_lng, 
+            muni_feats, click_mask, wf_features, fl_features
+        )
+        
+        if clicked_feature_info:
+            feature, feature_type = clicked_feature_info
+            zoom_to_feature(feature, feature_type)
+            st.rerun(scope="fragment")  # Rerun only the map to apply zoom
+
 # -------------------------- Main Home Page Function --------------------------
 
 def home_page():
@@ -331,11 +601,6 @@ def home_page():
     # Add custom CSS for metric cards
     st.markdown(create_metric_card_html(), unsafe_allow_html=True)
 
-    # Display current map state info (for debugging/user feedback)
-    if st.session_state.map_state['last_clicked_feature']:
-        clicked_info = st.session_state.map_state['last_clicked_feature']
-        st.info(f"🎯 Currently focused on: {clicked_info['name']} ({clicked_info['type']})")
-
     # Reset view button
     col_reset, col_spacer = st.columns([1, 4])
     with col_reset:
@@ -359,8 +624,7 @@ def home_page():
         muni_default = "data/mb_with_winnipeg.geojson"
         
         if os.path.exists(muni_default):
-            with open(muni_default, "r", encoding="utf-8") as f:
-                muni = json.load(f)
+            muni_feats, muni_index, statuses = load_municipalities(muni_default)
         else:
             st.error(f"Municipality file not found: {muni_default}")
             st.stop()
@@ -387,8 +651,12 @@ def home_page():
         # Option to reset data
         if st.session_state.incidents_source != "default":
             if st.button("🔄 Reset to Default Data", type="secondary", use_container_width=True):
+                load_default_incidents.clear()
                 st.session_state.incidents_data = load_default_incidents()
                 st.session_state.incidents_source = "default"
+                # Rebuilt lazily by the report page on the next upload
+                st.session_state.pop('incident_signatures', None)
+                st.session_state.incidents_version = st.session_state.get('incidents_version', 0) + 1
                 if 'upload_history' in st.session_state:
                     del st.session_state.upload_history
                 st.success("Reset to default incident data!")
@@ -397,19 +665,18 @@ def home_page():
         st.divider()
 
         # Municipality filters
-        muni_feats = muni.get("features", [])
-        normalize_muni_properties(muni_feats)
-
         st.header("🎯 Municipality Filters")
-        statuses = sorted({f["properties"].get("status", "Unknown") for f in muni_feats})
-        pops = [f["properties"].get("population_2021") for f in muni_feats if isinstance(f["properties"].get("population_2021"), (int, float))]
-        pop_min = int(min(pops)) if pops else 0
-        pop_max = int(max(pops)) if pops else 0
+        muni_pop = muni_index["pop"]
+        if not np.isnan(muni_pop).all():
+            pop_min, pop_max = int(np.nanmin(muni_pop)), int(np.nanmax(muni_pop))
+        else:
+            pop_min = pop_max = 0
         
         sel_status = st.multiselect("Status", options=statuses, default=statuses)
         sel_pop = st.slider("Population (2021) range", min_value=0, max_value=pop_max, value=(pop_min, pop_max), step=1)
 
-        muni_filtered = [f for f in muni_feats if muni_passes(f, sel_status, sel_pop)]
+        muni_mask = muni_filter_mask(muni_index, sel_status, sel_pop)
+        muni_filtered = [muni_feats[i] for i in np.flatnonzero(muni_mask)]
         st.write(f"**Selected places:** {len(muni_filtered)} / {len(muni_feats)}")
         
         if len(muni_filtered) == 0:
@@ -437,10 +704,10 @@ def home_page():
     # -------------------------- Main Content Area --------------------------
     
     # Split incidents by type
-    wf_features, fl_features = split_incidents(incidents_data, inc_status_filter)
+    wf_features, fl_features = _split_cached(incidents_data, inc_status_filter)
 
     # Calculate metrics
-    total_pop = sum(f["properties"].get("population_2021", 0) for f in muni_filtered if isinstance(f["properties"].get("population_2021"), (int, float)))
+    total_pop = int(muni_pop[muni_mask].sum())
     wf_count = len(wf_features) if show_wf else 0
     fl_count = len(fl_features) if show_fl else 0
     source_label = "Default" if st.session_state.incidents_source == "default" else "Merged"
@@ -498,6 +765,7 @@ def home_page():
     # Load local SVG icons
     fire_icon_path = os.path.join("images", "fire-svgrepo-com.svg")
     flood_icon_path = os.path.join("images", "water-fee-svgrepo-com.svg")
+    # Fresh CustomIcons per render (folium reparents them); the SVG data URIs are cached in utils
     fire_svg_icon = load_svg_icon(fire_icon_path, size=(30, 30))
     flood_svg_icon = load_svg_icon(flood_icon_path, size=(30, 30))
 
@@ -515,159 +783,12 @@ def home_page():
     
     # -------------------------- Map Creation with State Persistence --------------------------
     
-    # Use stored map state for center and zoom
-    map_center = st.session_state.map_state['center']
-    map_zoom = st.session_state.map_state['zoom']
-    
-    # Initialize map with persisted state
-    m = folium.Map(
-        location=map_center, 
-        zoom_start=map_zoom, 
-        control_scale=True, 
-        tiles="OpenStreetMap"
+    map_fragment(
+        manitoba_boundary, show_mask, muni_feats, muni_mask, muni_filtered,
+        wf_features, fl_features, show_wf, show_fl,
+        fire_svg_icon, flood_svg_icon
     )
 
-    # Add Manitoba mask if enabled
-    if show_mask and manitoba_boundary is not None:
-        add_manitoba_mask(m, manitoba_boundary)
-
-    # Add municipalities layer only if there are filtered municipalities
-    if len(muni_filtered) > 0:
-        muni_popup = folium.GeoJsonPopup(
-            fields=["name", "status", "population_2021"],
-            aliases=["Name", "Status", "Population (2021)"],
-            localize=True,
-            labels=True,
-            style="background-color:white; font-size:14px;"
-        )
-        muni_tooltip = folium.GeoJsonTooltip(
-            fields=["name", "status", "population_2021"],
-            aliases=["Name", "Status", "Population (2021)"],
-            localize=True,
-            sticky=False,
-        )
-        folium.GeoJson(
-            {"type": "FeatureCollection", "features": muni_filtered},
-            name="Municipal Boundaries",
-            style_function=make_muni_style,
-            tooltip=muni_tooltip,
-            popup=muni_popup,
-            highlight_function=lambda x: {"weight": 3},
-        ).add_to(m)
-
-    # Add wildfire markers
-    if show_wf:
-        wf_layer = folium.FeatureGroup(name="Wildfires", show=True)
-        for f in wf_features:
-            props = f.get("properties", {})
-            # Polygon
-            folium.GeoJson(
-                f,
-                style_function=lambda _f, p=props: style_for_feature(p),
-                highlight_function=lambda x: {"weight": 3}
-            ).add_to(wf_layer)
-            # Marker at centroid
-            lat, lon = centroid_of_feature(f)
-            name = props.get("name", "Wildfire")
-            conf = (props.get("status") or props.get("confidence") or "unknown").title()
-            started = props.get("started_at", "")
-            desc = props.get("description", "")
-            source_indicator = " [User Added]" if st.session_state.incidents_source == "merged" and props.get("user_added", False) else ""
-            html = f"<b>{name}{source_indicator}</b><br>Type: Wildfire<br>Confidence: {conf}<br>Started: {started}<br>Details: {desc}<br><i>Click to zoom to this feature</i>"
-            folium.Marker(
-                location=(lat, lon),
-                icon=icon_for_feature(props, fire_icon=fire_svg_icon),
-                tooltip=f"{name} • {conf}",
-                popup=folium.Popup(html, max_width=350)
-            ).add_to(wf_layer)
-        wf_layer.add_to(m)
-
-    # Add flood markers
-    if show_fl:
-        fl_layer = folium.FeatureGroup(name="Floods", show=True)
-        for f in fl_features:
-            props = f.get("properties", {})
-            # Polygon
-            folium.GeoJson(
-                f,
-                style_function=lambda _f, p=props: style_for_feature(p),
-                highlight_function=lambda x: {"weight": 3}
-            ).add_to(fl_layer)
-            # Marker at centroid
-            lat, lon = centroid_of_feature(f)
-            name = props.get("name", "Flood")
-            conf = (props.get("status") or props.get("confidence") or "unknown").title()
-            started = props.get("started_at", "")
-            desc = props.get("description", "")
-            source_indicator = " [User Added]" if st.session_state.incidents_source == "merged" and props.get("user_added", False) else ""
-            html = f"<b>{name}{source_indicator}</b><br>Type: Flood<br>Confidence: {conf}<br>Started: {started}<br>Details: {desc}<br><i>Click to zoom to this feature</i>"
-            folium.Marker(
-                location=(lat, lon),
-                icon=icon_for_feature(props, flood_icon=flood_svg_icon),
-                tooltip=f"{name} • {conf}",
-                popup=folium.Popup(html, max_width=350)
-            ).add_to(fl_layer)
-        fl_layer.add_to(m)
-
-    # Apply bounds if zooming to feature
-    if st.session_state.map_state['zoom_to_feature'] and st.session_state.map_state['bounds']:
-        m.fit_bounds(st.session_state.map_state['bounds'])
-        # Reset the zoom_to_feature flag after applying
-        st.session_state.map_state['zoom_to_feature'] = False
-    else:
-        # Fit map bounds based on available data only if no specific zoom target
-        if manitoba_boundary is not None and show_mask and not st.session_state.map_state['last_clicked_feature']:
-            bounds = manitoba_boundary.total_bounds
-            m.fit_bounds([[bounds[1], bounds[0]], [bounds[3], bounds[2]]])
-        elif not st.session_state.map_state['last_clicked_feature']:
-            # Determine what features to use for bounds
-            if muni_filtered:
-                feats_for_bounds = muni_filtered
-            elif show_wf and wf_features:
-                feats_for_bounds = wf_features
-            elif show_fl and fl_features:
-                feats_for_bounds = fl_features
-            else:
-                feats_for_bounds = []
-            
-            if feats_for_bounds:
-                south_west, north_east = get_bounds(feats_for_bounds)
-                m.fit_bounds([south_west, north_east])
-
-    # Add layer control
-    folium.LayerControl(collapsed=True).add_to(m)
-    
-    # Render map and capture interactions
-    map_data = st_folium(
-        m, 
-        width=None, 
-        height=720, 
-        key="main_map",
-        returned_objects=["last_object_clicked", "center", "zoom", "bounds"]
-    )
-
-    # -------------------------- Handle Map Interactions --------------------------
-    
-    # Update map state from user interaction (pan/zoom)
-    if map_data:
-        update_map_state_from_interaction(map_data)
-    
-    # Handle clicks on features (markers/polygons)
-    if map_data and map_data.get('last_object_clicked'):
-        clicked_lat = map_data['last_object_clicked']['lat']
-        clicked_lng = map_data['last_object_clicked']['lng']
-        
-        # Find which feature was clicked
-        clicked_feature_info = find_clicked_feature(
-            clicked_lat, clicked_lng, 
-            muni_filtered, wf_features, fl_features
-        )
-        
-        if clicked_feature_info:
-            feature, feature_type = clicked_feature_info
-            zoom_to_feature(feature, feature_type)
-            st.rerun()  # Trigger rerun to apply zoom
-
     # Display warnings about missing data
     if len(muni_filtered) == 0:
         st.info("💡 Tip: Adjust the municipality filters in the sidebar to display boundary and population data on the map.")
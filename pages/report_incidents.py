@@ -4,17 +4,39 @@ Report Incidents Page - Upload and manage incident data
 This module contains the report incidents page function for uploading incident data.
 """
 import json
+from collections import Counter
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 import os
 
+# Import helpers from utils folder
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.utils import load_json, loads_json, dumps_json
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; large uploads are then parsed in one go
+    ijson = None
+
+# Uploads larger than this are streamed feature-by-feature with ijson
+STREAM_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Column order of the upload history records and table
+UPLOAD_HISTORY_COLUMNS = ["filename", "timestamp", "new_incidents", "duplicates"]
+
+@st.cache_data(show_spinner=False)
 def load_default_incidents():
-    """Load the default incidents data from file"""
+    """
+    Load the default incidents data from file.
+    Cached across reruns; st.cache_data hands each caller its own copy,
+    so the result can be stored in and mutated via session_state.
+    """
     inc_default = "data/incidents_dummy.geojson"
     if os.path.exists(inc_default):
-        with open(inc_default, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(inc_default)
     return {"type": "FeatureCollection", "features": []}
 
 def parse_incidents_data(data):
@@ -27,14 +49,13 @@ def parse_incidents_data(data):
         # Check if it's a custom JSON format that can be converted
         elif isinstance(data, dict) and "incidents" in data:
             # Convert custom format to GeoJSON if needed
+            # (inlined loop with a pre-bound append: no per-incident function call)
             features = []
+            append = features.append
             for incident in data["incidents"]:
                 if "geometry" in incident:
-                    features.append({
-                        "type": "Feature",
-                        "geometry": incident["geometry"],
-                        "properties": {k: v for k, v in incident.items() if k != "geometry"}
-                    })
+                    props = dict(incident)
+                    append({"type": "Feature", "geometry": props.pop("geometry"), "properties": props})
             geojson = {
                 "type": "FeatureCollection",
                 "features": features
@@ -45,48 +66,125 @@ def parse_incidents_data(data):
     except Exception as e:
         return False, None, f"Error parsing data: {str(e)}"
 
-def merge_incidents_data(existing_data, new_data):
+def _freeze(value):
+    """Recursively convert lists to tuples so coordinates can be hashed"""
+    if isinstance(value, list):
+        if value and not isinstance(value[0], list):
+            return tuple(value)  # a single [lon, lat] position
+        return tuple(map(_freeze, value))
+    return value
+
+def incident_signature(feature):
+    """
+    Return a duplicate-detection signature for an incident feature:
+    a (name, type, first coordinate ring/element) tuple.
+    """
+    props = feature.get("properties", {})
+    geom = feature.get("geometry", {})
+    coords = geom.get("coordinates") if geom else None
+    first = _freeze(coords[0]) if coords else ()
+    return (props.get("name", ""), props.get("type", ""), first)
+
+def build_incident_signatures(data):
+    """Build the signature set for all features of an incidents FeatureCollection"""
+    return {incident_signature(f) for f in (data or {}).get("features", [])}
+
+def get_incident_signatures():
+    """Return the session's incident signature set, building it once if missing"""
+    if 'incident_signatures' not in st.session_state:
+        st.session_state.incident_signatures = build_incident_signatures(st.session_state.incidents_data)
+    return st.session_state.incident_signatures
+
+def bump_incidents_version():
+    """Mark st.session_state.incidents_data as changed (invalidates derived caches)"""
+    st.session_state.incidents_version = st.session_state.get('incidents_version', 0) + 1
+
+def get_download_bytes(data):
+    """
+    Return the compact GeoJSON bytes for the download button, re-serializing
+    only when incidents_version has changed since the last call.
+    """
+    version = st.session_state.get('incidents_version', 0)
+    cached = st.session_state.get('_download_cache')
+    if cached and cached[0] == version:
+        return cached[1]
+    payload = dumps_json(data)
+    st.session_state._download_cache = (version, payload)
+    return payload
+
+def stream_upload_features(uploaded_file):
+    """
+    Return a streaming ijson iterator over the features of a large upload, or
+    None if the document is not a GeoJSON FeatureCollection whose "type" comes
+    before "features". Custom incident formats need parse_incidents_data and
+    are therefore not supported on the streaming path.
+    """
+    is_collection = False
+    for prefix, event, value in ijson.parse(uploaded_file):
+        if prefix == "type" and event == "string":
+            is_collection = value == "FeatureCollection"
+        elif prefix == "" and event == "map_key" and value == "features":
+            break
+    uploaded_file.seek(0)
+    if not is_collection:
+        return None
+    return ijson.items(uploaded_file, "features.item", use_float=True)
+
+def merge_incidents_data(existing_data, new_data, existing_signatures):
     """
     Merge new incidents with existing incidents data.
     Checks for duplicates based on geometry and key properties.
+
+    existing_signatures is the signature set of existing_data (see
+    build_incident_signatures); it is updated in place with the added features,
+    only once the whole input has been read, so a stream that fails part-way
+    leaves it untouched.
+    The features list of existing_data is extended in place as well.
+    new_data["features"] may be any iterable, e.g. a streaming ijson parser.
     """
     if not existing_data:
-        return new_data
+        existing_data = {"type": "FeatureCollection", "features": []}
     
-    # Create a set of existing incident signatures for duplicate detection
-    existing_signatures = set()
-    for feature in existing_data.get("features", []):
-        props = feature.get("properties", {})
-        geom = feature.get("geometry", {})
-        # Create a signature based on name, type, and first coordinate
-        coords_str = str(geom.get("coordinates", [])[:1]) if geom else ""
-        signature = f"{props.get('name', '')}-{props.get('type', '')}-{coords_str}"
-        existing_signatures.add(signature)
-    
-    # Merge non-duplicate features
-    merged_features = existing_data.get("features", []).copy()
-    new_features_added = 0
+    # Collect non-duplicate features (also skipping repeats within the new data)
+    new_unique = []
+    new_signatures = set()
     duplicates_found = 0
     
     for feature in new_data.get("features", []):
-        props = feature.get("properties", {})
-        geom = feature.get("geometry", {})
-        coords_str = str(geom.get("coordinates", [])[:1]) if geom else ""
-        signature = f"{props.get('name', '')}-{props.get('type', '')}-{coords_str}"
+        signature = incident_signature(feature)
         
-        if signature not in existing_signatures:
-            merged_features.append(feature)
-            existing_signatures.add(signature)
-            new_features_added += 1
+        if signature not in existing_signatures and signature not in new_signatures:
+            new_unique.append(feature)
+            new_signatures.add(signature)
         else:
             duplicates_found += 1
+    existing_signatures.update(new_signatures)
+    
+    # Extend the existing features list in place rather than copying it;
+    # the wrapper dict is new so identity-keyed caches see the change
+    merged_features = existing_data.setdefault("features", [])
+    merged_features.extend(new_unique)
     
     result = {
         "type": "FeatureCollection",
         "features": merged_features
     }
     
-    return result, new_features_added, duplicates_found
+    return result, len(new_unique), duplicates_found
+
+# Row icons for the summary breakdowns, keyed by lower-cased value
+TYPE_ICONS = {"wildfire": "🔥", "flood": "💧"}
+STATUS_ICONS = {"confirmed": "✅", "suspected": "⚠️"}
+
+def _breakdown_markdown(heading, counts, icons):
+    """Render a sorted value/count breakdown as a single markdown block"""
+    lines = [f"**{heading}:**", ""]
+    lines.extend(f"{icons.get(str(value).lower(), '•')} {value}: {count}  " for value, count in sorted(counts.items()))
+    return "\n".join(lines)
+
+def _incident_status(props):
+    """Return the status of an incident, falling back to its confidence"""
+    return props.get("status") or props.get("confidence", "Unknown")
 
 def display_incidents_summary(data, title="Incident Summary"):
     """Display a summary of the incidents data"""
@@ -99,19 +197,9 @@ def display_incidents_summary(data, title="Incident Summary"):
         return
     
     # Extract incident types and counts
-    incident_types = {}
-    incident_statuses = {}
-    
-    for feature in features:
-        props = feature.get("properties", {})
-        
-        # Get incident type
-        inc_type = props.get("type", "Unknown")
-        incident_types[inc_type] = incident_types.get(inc_type, 0) + 1
-        
-        # Get incident status
-        status = props.get("status") or props.get("confidence", "Unknown")
-        incident_statuses[status] = incident_statuses.get(status, 0) + 1
+    all_props = [feature.get("properties", {}) for feature in features]
+    incident_types = Counter(props.get("type", "Unknown") for props in all_props)
+    incident_statuses = Counter(_incident_status(props) for props in all_props)
     
     # Display summary metrics
     col1, col2, col3 = st.columns(3)
@@ -127,39 +215,32 @@ def display_incidents_summary(data, title="Incident Summary"):
     
     col1, col2 = st.columns(2)
     
+    # One markdown block per column instead of one st.write per row
     with col1:
-        st.write("**By Type:**")
-        for inc_type, count in sorted(incident_types.items()):
-            if inc_type.lower() == "wildfire":
-                st.write(f"🔥 {inc_type}: {count}")
-            elif inc_type.lower() == "flood":
-                st.write(f"💧 {inc_type}: {count}")
-            else:
-                st.write(f"• {inc_type}: {count}")
+        st.markdown(_breakdown_markdown("By Type", incident_types, TYPE_ICONS))
     
     with col2:
-        st.write("**By Status:**")
-        for status, count in sorted(incident_statuses.items()):
-            if status.lower() == "confirmed":
-                st.write(f"✅ {status}: {count}")
-            elif status.lower() == "suspected":
-                st.write(f"⚠️ {status}: {count}")
-            else:
-                st.write(f"• {status}: {count}")
+        st.markdown(_breakdown_markdown("By Status", incident_statuses, STATUS_ICONS))
     
     # Show sample data
     with st.expander("View Sample Incident Data"):
-        sample_data = []
+        # Build the columns directly rather than a list of row dicts
+        names, types, statuses, starts, descs = [], [], [], [], []
         for i, feature in enumerate(features[:10]):  # Show first 10
             props = feature.get("properties", {})
-            sample_data.append({
-                "Name": props.get("name", f"Incident {i+1}"),
-                "Type": props.get("type", "Unknown"),
-                "Status": props.get("status") or props.get("confidence", "Unknown"),
-                "Started": props.get("started_at", "N/A"),
-                "Description": (props.get("description", "N/A")[:50] + "...") if len(props.get("description", "")) > 50 else props.get("description", "N/A")
-            })
-        df = pd.DataFrame(sample_data)
+            desc = props.get("description") or "N/A"
+            names.append(props.get("name", f"Incident {i+1}"))
+            types.append(props.get("type", "Unknown"))
+            statuses.append(_incident_status(props))
+            starts.append(props.get("started_at", "N/A"))
+            descs.append(desc[:50] + "..." if len(desc) > 50 else desc)
+        df = pd.DataFrame({
+            "Name": names,
+            "Type": types,
+            "Status": statuses,
+            "Started": starts,
+            "Description": descs
+        })
         st.dataframe(df, use_container_width=True)
         
         if len(features) > 10:
@@ -177,6 +258,7 @@ def report_incidents_page():
     if 'incidents_data' not in st.session_state:
         st.session_state.incidents_data = load_default_incidents()
         st.session_state.incidents_source = "default"
+        st.session_state.incident_signatures = build_incident_signatures(st.session_state.incidents_data)
     
     # Create tabs for better organization
     tab1, tab2, tab3 = st.tabs(["📤 Upload Data", "📋 Current Data", "❓ Help & Guidelines"])
@@ -204,22 +286,35 @@ def report_incidents_page():
             if st.button("🔄 Process & Add Incidents", type="primary", use_container_width=True):
                 with st.spinner("Processing and merging incident data..."):
                     try:
-                        # Load and parse the file
-                        new_incidents_data = json.load(uploaded_file)
-                        
-                        # Validate and process the data
-                        is_valid, processed_data, message = parse_incidents_data(new_incidents_data)
+                        if ijson is not None and uploaded_file.size > STREAM_UPLOAD_BYTES:
+                            # Large GeoJSON: stream features one at a time into the merge
+                            # instead of materializing the whole document
+                            features = stream_upload_features(uploaded_file)
+                            is_valid = features is not None
+                            processed_data = {"type": "FeatureCollection", "features": features}
+                            message = ("Files over "
+                                       f"{STREAM_UPLOAD_BYTES // (1024 * 1024)} MB must be a GeoJSON "
+                                       "FeatureCollection (with \"type\" before \"features\"); "
+                                       "custom incident formats are only supported for smaller files.")
+                        else:
+                            # Load and parse the file
+                            new_incidents_data = loads_json(uploaded_file.getvalue())
+                            
+                            # Validate and process the data
+                            is_valid, processed_data, message = parse_incidents_data(new_incidents_data)
                         
                         if is_valid:
                             # Merge with existing data
                             merged_data, new_count, dupe_count = merge_incidents_data(
                                 st.session_state.incidents_data, 
-                                processed_data
+                                processed_data,
+                                get_incident_signatures()
                             )
                             
                             # Update session state
                             st.session_state.incidents_data = merged_data
                             st.session_state.incidents_source = "merged"
+                            bump_incidents_version()
                             
                             # Track upload history
                             if 'upload_history' not in st.session_state:
@@ -295,7 +390,7 @@ def report_incidents_page():
             if 'upload_history' in st.session_state and st.session_state.upload_history:
                 st.divider()
                 st.subheader("📜 Upload History")
-                history_df = pd.DataFrame(st.session_state.upload_history)
+                history_df = pd.DataFrame.from_records(st.session_state.upload_history, columns=UPLOAD_HISTORY_COLUMNS)
                 st.dataframe(history_df, use_container_width=True, hide_index=True)
             
             # Action buttons
@@ -304,8 +399,11 @@ def report_incidents_page():
             
             with col1:
                 if st.button("🔄 Reset to Default", type="secondary", use_container_width=True):
+                    load_default_incidents.clear()
                     st.session_state.incidents_data = load_default_incidents()
                     st.session_state.incidents_source = "default"
+                    bump_incidents_version()
+                    st.session_state.incident_signatures = build_incident_signatures(st.session_state.incidents_data)
                     if 'upload_history' in st.session_state:
                         del st.session_state.upload_history
                     st.success("Reset to default incident data!")
@@ -320,7 +418,7 @@ def report_incidents_page():
                 # Download current merged data
                 st.download_button(
                     label="💾 Download Current Data",
-                    data=json.dumps(current_data, indent=2),
+                    data=get_download_bytes(current_data),
                     file_name=f"merged_incidents_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson",
                     mime="application/json",
                     use_container_width=True
@@ -473,7 +571,7 @@ def report_incidents_page():
         
         st.download_button(
             label="📥 Download Example GeoJSON",
-            data=json.dumps(example_geojson, indent=2),
+            data=dumps_json(example_geojson, indent=True),
             file_name="example_incidents.geojson",
             mime="application/json",
             use_container_width=True
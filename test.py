@@ -2,8 +2,12 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 import json
+import os
 import numpy as np
-from datetime import datetime
+
+from geo_kernels import bounds_kernel, nearest_kernel
+# Imported (not defined here) so the memo caches survive script reruns
+from utils.utils import format_started_at
 
 # Page configuration
 st.set_page_config(
@@ -14,11 +18,20 @@ st.set_page_config(
 
 st.title("🔥 Manitoba Wildfire Monitoring System")
 
+DATA_PATH = "data/upload_example.geojson"
+
+def data_version():
+    """Modification time of the data file, used to key the caches below (0 if missing)"""
+    try:
+        return os.stat(DATA_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
 # Load GeoJSON data
 @st.cache_data
-def load_geojson_data():
+def load_geojson_data(version):
     try:
-        with open("data/upload_example.geojson", "r") as f:
+        with open(DATA_PATH, "r") as f:
             return json.load(f)
     except FileNotFoundError:
         st.error("Could not find data/incidents.geojson file. Please ensure the file exists in the data directory.")
@@ -36,18 +49,29 @@ def calculate_bounds(coordinates):
         # Single polygon
         flat_coords = coordinates[0]
     
-    lons = [coord[0] for coord in flat_coords]
-    lats = [coord[1] for coord in flat_coords]
+    # (N, 2) array of (lon, lat); reduce both columns at once
+    arr = np.ascontiguousarray(flat_coords, dtype=np.float64)
+    min_lon, min_lat, max_lon, max_lat = bounds_kernel(arr)
     
     return {
-        'min_lat': min(lats),
-        'max_lat': max(lats),
-        'min_lon': min(lons),
-        'max_lon': max(lons),
-        'center_lat': (min(lats) + max(lats)) / 2,
-        'center_lon': (min(lons) + max(lons)) / 2
+        'min_lat': min_lat,
+        'max_lat': max_lat,
+        'min_lon': min_lon,
+        'max_lon': max_lon,
+        'center_lat': (min_lat + max_lat) / 2,
+        'center_lon': (min_lon + max_lon) / 2
     }
 
+# Per-run memo of feature bounds, keyed by feature identity
+_bounds_cache = {}
+
+def feature_bounds(feature):
+    """Return calculate_bounds for a feature, computing it at most once per run"""
+    key = id(feature)
+    if key not in _bounds_cache:
+        _bounds_cache[key] = calculate_bounds(feature['geometry']['coordinates'])
+    return _bounds_cache[key]
+
 def calculate_zoom_level(bounds):
     """Calculate appropriate zoom level based on bounds"""
     lat_diff = bounds['max_lat'] - bounds['min_lat']
@@ -71,30 +95,56 @@ def calculate_zoom_level(bounds):
     else:
         return 13
 
+def incident_color(props):
+    """Return the marker/outline color for an incident based on type and status"""
+    confirmed = props['status'] == 'confirmed'
+    if props['type'] == 'wildfire':
+        return 'red' if confirmed else 'orange'
+    elif props['type'] == 'flood':
+        return 'blue' if confirmed else 'lightblue'
+    return 'gray'
+
+def incident_style(feature):
+    """Style function for the incident polygon layer"""
+    color = incident_color(feature['properties'])
+    return {'color': color, 'weight': 2, 'opacity': 0.8, 'fillColor': color, 'fillOpacity': 0.2}
+
 # Initialize session state
 if 'selected_fire' not in st.session_state:
     st.session_state.selected_fire = None
 
 # Load data
-geojson_data = load_geojson_data()
+current_version = data_version()
+geojson_data = load_geojson_data(current_version)
 
 if geojson_data is None:
     st.stop()
 
+# Single pass over the features: names plus per-type buckets for the metrics and tabs
+names = []
+buckets = {'wildfire': [], 'flood': [], '_other': []}
+for feature in geojson_data['features']:
+    names.append(feature['properties']['name'])
+    buckets.get(feature['properties']['type'], buckets['_other']).append(feature)
+
+# Incident centers, precomputed once per run: (N, 2) array of (lat, lon)
+centers = np.array(
+    [[b['center_lat'], b['center_lon']] for b in map(feature_bounds, geojson_data['features'])],
+    dtype=np.float64
+).reshape(-1, 2)
+
+# Max distance (degrees) between a click and an incident center to select it
+CLICK_RADIUS_DEG = 0.1
+
 # Manitoba center coordinates
 manitoba_center = [55.0, -98.0]
 default_zoom = 6
 
 # Determine map center and zoom based on selected fire
 if st.session_state.selected_fire:
-    selected_feature = None
-    for feature in geojson_data['features']:
-        if feature['properties']['name'] == st.session_state.selected_fire:
-            selected_feature = feature
-            break
-    
-    if selected_feature:
-        bounds = calculate_bounds(selected_feature['geometry']['coordinates'])
+    if st.session_state.selected_fire in names:
+        selected_feature = geojson_data['features'][names.index(st.session_state.selected_fire)]
+        bounds = feature_bounds(selected_feature)
         map_center = [bounds['center_lat'], bounds['center_lon']]
         map_zoom = calculate_zoom_level(bounds)
     else:
@@ -104,90 +154,102 @@ else:
     map_center = manitoba_center
     map_zoom = default_zoom
 
-# Create the map
-m = folium.Map(
-    location=map_center,
-    zoom_start=map_zoom,
-    tiles='OpenStreetMap'
-)
+# Process and add incidents to map
+wildfire_count = len(buckets['wildfire'])
+flood_count = len(buckets['flood'])
 
-# Add Manitoba boundary (approximate)
-manitoba_bounds = [
-    [60.0, -102.0],  # Northwest
-    [60.0, -89.0],   # Northeast
-    [49.0, -89.0],   # Southeast
-    [49.0, -102.0],  # Southwest
-    [60.0, -102.0]   # Close polygon
-]
-
-folium.Polygon(
-    locations=[[lat, lon] for lat, lon in manitoba_bounds],
-    color='blue',
-    weight=2,
-    opacity=0.6,
-    fill=False,
-    popup='Manitoba Province Boundary'
-).add_to(m)
+def build_map(features, centers, center, zoom):
+    """Build the incident map for the given view"""
+    # Create the map
+    m = folium.Map(
+        location=list(center),
+        zoom_start=zoom,
+        tiles='OpenStreetMap'
+    )
 
-# Process and add incidents to map
-wildfire_count = 0
-flood_count = 0
+    # Add Manitoba boundary (approximate)
+    manitoba_bounds = [
+        [60.0, -102.0],  # Northwest
+        [60.0, -89.0],   # Northeast
+        [49.0, -89.0],   # Southeast
+        [49.0, -102.0],  # Southwest
+        [60.0, -102.0]   # Close polygon
+    ]
 
-for feature in geojson_data['features']:
-    props = feature['properties']
-    coords = feature['geometry']['coordinates']
-    
-    # Calculate center of the incident area
-    bounds = calculate_bounds(coords)
-    center_lat = bounds['center_lat']
-    center_lon = bounds['center_lon']
-    
-    # Determine icon and color based on incident type
-    if props['type'] == 'wildfire':
-        icon_name = 'fire'
-        icon_color = 'red' if props['status'] == 'confirmed' else 'orange'
-        wildfire_count += 1
-    elif props['type'] == 'flood':
-        icon_name = 'tint'
-        icon_color = 'blue' if props['status'] == 'confirmed' else 'lightblue'
-        flood_count += 1
-    
-    # Create popup content
-    status_emoji = "✅" if props['status'] == 'confirmed' else "⚠️"
-    popup_content = f"""
-    <b>{props['name']}</b><br>
-    Type: {props['type'].title()}<br>
-    Status: {status_emoji} {props['status'].title()}<br>
-    Started: {datetime.fromisoformat(props['started_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')}<br>
-    Description: {props['description']}
-    """
-    
-    # Add marker
-    folium.Marker(
-        location=[center_lat, center_lon],
-        popup=folium.Popup(popup_content, max_width=300),
-        tooltip=f"Click to zoom to {props['name']}",
-        icon=folium.Icon(
-            icon=icon_name,
-            prefix='fa',
-            color=icon_color
-        )
+    folium.Polygon(
+        locations=manitoba_bounds,
+        color='blue',
+        weight=2,
+        opacity=0.6,
+        fill=False,
+        popup='Manitoba Province Boundary'
     ).add_to(m)
-    
-    # Add polygon outline
-    if feature['geometry']['type'] == 'Polygon':
-        # Convert coordinates to [lat, lon] format for folium
-        polygon_coords = [[lat, lon] for lon, lat in coords[0]]
+
+    # Process and add incidents to map
+    for feature, (center_lat, center_lon) in zip(features, centers.tolist()):
+        props = feature['properties']
+        
+        # Determine icon and color based on incident type
+        icon_name = 'fire' if props['type'] == 'wildfire' else 'tint' if props['type'] == 'flood' else 'info-circle'
+        icon_color = incident_color(props)
         
-        folium.Polygon(
-            locations=polygon_coords,
-            color=icon_color,
-            weight=2,
-            opacity=0.8,
-            fill=True,
-            fillOpacity=0.2,
-            popup=props['name']
+        # Create popup content
+        status_emoji = "✅" if props['status'] == 'confirmed' else "⚠️"
+        popup_content = f"""
+        <b>{props['name']}</b><br>
+        Type: {props['type'].title()}<br>
+        Status: {status_emoji} {props['status'].title()}<br>
+        Started: {format_started_at(props['started_at'])}<br>
+        Description: {props['description']}
+        """
+        
+        # Add marker
+        folium.Marker(
+            location=[center_lat, center_lon],
+            popup=folium.Popup(popup_content, max_width=300),
+            tooltip=f"Click to zoom to {props['name']}",
+            icon=folium.Icon(
+                icon=icon_name,
+                prefix='fa',
+                color=icon_color
+            )
+        ).add_to(m)
+
+    # Add all polygon outlines as a single GeoJSON layer (GeoJSON keeps lon/lat order)
+    polygon_features = [f for f in features if f['geometry']['type'] == 'Polygon']
+    if polygon_features:
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": polygon_features},
+            name="Incident Areas",
+            style_function=incident_style,
+            popup=folium.GeoJsonPopup(fields=["name"], labels=False)
         ).add_to(m)
+    
+    return m
+
+# Maximum number of maps cached per session (oldest evicted first)
+MAP_CACHE_ENTRIES = 16
+
+def cached_map(features, centers, center, zoom, version):
+    """
+    Return build_map(...) memoized per session and keyed on the view (center, zoom)
+    and the data file version (see data_version). Maps are not shared between
+    sessions because st_folium mutates the map object it renders.
+    """
+    cache = st.session_state.setdefault('_map_cache', {})
+    key = (center, zoom, version)
+    m = cache.get(key)
+    if m is None:
+        if len(cache) >= MAP_CACHE_ENTRIES:
+            cache.pop(next(iter(cache)))  # evict the oldest entry
+        m = cache[key] = build_map(features, centers, center, zoom)
+    return m
+
+m = cached_map(
+    geojson_data['features'], centers,
+    tuple(map_center), map_zoom,
+    current_version
+)
 
 # Display the map and capture interactions
 st.subheader("Interactive Incident Map")
@@ -220,20 +282,11 @@ if map_data['last_object_clicked'] is not None:
     clicked_lng = map_data['last_object_clicked']['lng']
     
     # Find which incident was clicked based on proximity to center
+    # (nearest center by squared distance, no sqrt)
     clicked_incident = None
-    min_distance = float('inf')
-    
-    for feature in geojson_data['features']:
-        bounds = calculate_bounds(feature['geometry']['coordinates'])
-        center_lat = bounds['center_lat']
-        center_lon = bounds['center_lon']
-        
-        # Calculate distance from clicked point to incident center
-        distance = np.sqrt((clicked_lat - center_lat)**2 + (clicked_lng - center_lon)**2)
-        
-        if distance < min_distance and distance < 0.1:  # Within reasonable proximity
-            min_distance = distance
-            clicked_incident = feature['properties']['name']
+    idx, d2 = nearest_kernel(centers, clicked_lat, clicked_lng)
+    if idx >= 0 and d2 < CLICK_RADIUS_DEG ** 2:  # Within reasonable proximity
+        clicked_incident = names[idx]
     
     # Update selected fire if a new one was clicked
     if clicked_incident and clicked_incident != st.session_state.selected_fire:
@@ -247,15 +300,14 @@ st.subheader("📊 Incident Summary")
 tab1, tab2 = st.tabs(["🔥 Wildfires", "🌊 Floods"])
 
 with tab1:
-    wildfire_features = [f for f in geojson_data['features'] if f['properties']['type'] == 'wildfire']
-    for feature in wildfire_features:
+    for feature in buckets['wildfire']:
         props = feature['properties']
         status_color = "🟢" if props['status'] == 'confirmed' else "🟡"
         
         with st.expander(f"{status_color} {props['name']} ({props['status'].title()})"):
             col1, col2 = st.columns(2)
             with col1:
-                st.write(f"**Started:** {datetime.fromisoformat(props['started_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')}")
+                st.write(f"**Started:** {format_started_at(props['started_at'])}")
                 st.write(f"**Status:** {props['status'].title()}")
             with col2:
                 st.write(f"**Description:** {props['description']}")
@@ -264,15 +316,14 @@ with tab1:
                     st.rerun()
 
 with tab2:
-    flood_features = [f for f in geojson_data['features'] if f['properties']['type'] == 'flood']
-    for feature in flood_features:
+    for feature in buckets['flood']:
         props = feature['properties']
         status_color = "🟢" if props['status'] == 'confirmed' else "🟡"
         
         with st.expander(f"{status_color} {props['name']} ({props['status'].title()})"):
             col1, col2 = st.columns(2)
             with col1:
-                st.write(f"**Started:** {datetime.fromisoformat(props['started_at'].replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')}")
+                st.write(f"**Started:** {format_started_at(props['started_at'])}")
                 st.write(f"**Status:** {props['status'].title()}")
             with col2:
                 st.write(f"**Description:** {props['description']}")
@@ -2,98 +2,143 @@
 Append Winnipeg (boundary + 2021 population) to mb_10_munis_with_pop.geojson.
 
 Requirements (install if needed):
-  pip install geopandas shapely osmnx
+  pip install geopandas shapely>=2.0 numpy osmnx ijson orjson
 
 Usage:
-  python append_winnipeg.py --in mb_10_munis_with_pop.geojson \
-                            --out mb_10_munis_with_pop_plus_winnipeg.geojson
+  python add_wpg_to_geojson.py --in mb_10_munis_with_pop.geojson \
+                               --out mb_10_munis_with_pop_plus_winnipeg.geojson
+
+Without arguments, data/mb_10_munis_with_pop.geojson is read and
+data/mb_with_winnipeg.geojson written.
+
+The Winnipeg boundary is simplified to ~10 m by default (display use only);
+add --simplify 0 to keep every OSM vertex. The OSM boundary is cached in
+data/_winnipeg_boundary.wkb after the first fetch; add --refresh-boundary to
+fetch it again. An --out path ending in .ndjson writes one feature per line.
 """
 
 import argparse
 import json
+import mmap
 import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import ijson
+
+try:
+    import orjson
+except ImportError:  # optional; fall back to the stdlib json module
+    orjson = None
+
 import geopandas as gpd
+import numpy as np
 import osmnx as ox
+import shapely
+import shapely.wkb
 from shapely.geometry import mapping
-from shapely.ops import unary_union
 
 WINNIPEG_NAME = "Winnipeg"
 WINNIPEG_STATUS = "City"
 WINNIPEG_POP_2021 = 749_607  # Statistics Canada, 2021 Census, Winnipeg CSD (CY)
+WINNIPEG_BYTES_RE = re.compile(WINNIPEG_NAME.encode(), re.IGNORECASE)
 OSM_QUERY = "Winnipeg, Manitoba, Canada"
-
-def get_winnipeg_boundary():
+DEFAULT_IN_PATH = "data/mb_10_munis_with_pop.geojson"
+DEFAULT_OUT_PATH = "data/mb_with_winnipeg.geojson"
+# shapely.get_type_id values for Polygon and MultiPolygon
+POLYGONAL_TYPE_IDS = (3, 6)
+# Property keys mirrored from the input file when present
+SCHEMA_KEYS = ("MUNI_NAME", "MUNI_STATU", "population_2021", "name", "status")
+# Default boundary simplification (degrees, ~10 m). The output is meant for map
+# display, not cadastral use; pass --simplify 0 to keep the full OSM detail.
+DEFAULT_SIMPLIFY = 1e-4
+# Local copy of the OSM boundary (WKB) so repeat runs skip Nominatim
+BOUNDARY_CACHE = Path("data/_winnipeg_boundary.wkb")
+
+def get_winnipeg_boundary(refresh=False):
+    # Reuse the boundary cached by a previous run unless a refresh is requested
+    if not refresh and BOUNDARY_CACHE.exists():
+        return shapely.wkb.loads(BOUNDARY_CACHE.read_bytes())
+    geom = fetch_winnipeg_boundary_osm()
+    BOUNDARY_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    BOUNDARY_CACHE.write_bytes(shapely.wkb.dumps(geom))
+    return geom
+
+def fetch_winnipeg_boundary_osm():
     # Pull admin boundary for Winnipeg from OSM (as a GeoDataFrame in WGS84)
     gdf = ox.geocode_to_gdf(OSM_QUERY, which_result=None, by_osmid=False)
-    # Keep polygonal geometry only and dissolve to a single (multi)polygon
-    gdf = gdf[gdf.geometry.type.isin(["Polygon", "MultiPolygon"])].copy()
-    if gdf.empty:
+    # Keep polygonal geometry only (integer type ids, one ufunc call) and
+    # dissolve to a single (multi)polygon; boolean indexing yields a copy
+    parts = np.asarray(gdf.geometry.values)
+    parts = parts[np.isin(shapely.get_type_id(parts), POLYGONAL_TYPE_IDS)]
+    if parts.size == 0:
         raise RuntimeError("No polygonal geometry returned for Winnipeg from OSM.")
-    geom = unary_union(gdf.geometry.values)
+    # One vectorized GEOS union over the geometry array; OSM admin boundaries
+    # are often invalid, so repair those first rather than hit GEOS slow paths
+    invalid = ~shapely.is_valid(parts)
+    if invalid.any():
+        parts[invalid] = shapely.make_valid(parts[invalid])
+    geom = shapely.union_all(parts)
     return geom  # WGS84 already
 
-def load_geojson(path):
-    # Load without geopandas first to keep property schema intact if needed
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    if data.get("type") != "FeatureCollection":
-        raise ValueError("Input is not a valid GeoJSON FeatureCollection.")
-    return data
-
-def detect_property_schema(features):
-    # Expect keys like: MUNI_NAME, MUNI_STATU, population_2021, name, status
-    # We'll mirror what the file already uses; fall back if missing.
-    keys = set()
-    for f in features:
-        keys.update(f.get("properties", {}).keys())
+def read_header(path):
+    # Top-level members ("type", "crs", "name", ...) that precede "features";
+    # parsing stops at "features" so the feature array is never touched here
+    builders = {}
+    builder = None
+    with open(path, "rb") as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if prefix == "" and event == "map_key":
+                if value == "features":
+                    break
+                builder = builders[value] = ijson.ObjectBuilder()
+            elif builder is not None and prefix:
+                builder.event(event, value)
+    header = {k: b.value for k, b in builders.items()}
+    if header.get("type") != "FeatureCollection":
+        raise ValueError("Input is not a valid GeoJSON FeatureCollection "
+                         "(\"type\" must precede \"features\" for streaming).")
+    return header
+
+def probe_has_winnipeg(path):
+    # Cheap pre-check before the copy pass. A case-insensitive byte scan over the
+    # mmapped file (C speed, no parsing) rules Winnipeg out in the common case;
+    # only on a hit are the properties objects streamed, stopping at the first
+    # Winnipeg feature, to confirm it is really a feature name.
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if WINNIPEG_BYTES_RE.search(mm) is None:
+                return False
+        f.seek(0)
+        return any(is_winnipeg(props or {})
+                   for props in ijson.items(f, "features.item.properties", use_float=True))
+
+def iter_features(path):
+    # Stream features one at a time instead of loading the whole FeatureCollection
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "features.item", use_float=True)
+
+def dumps_feature(obj):
+    return orjson.dumps(obj) if orjson is not None else json.dumps(obj).encode("utf-8")
+
+def collect_schema_keys(props, found):
+    # Add the candidate keys present in props to found (no-op once complete)
+    if len(found) < len(SCHEMA_KEYS):
+        found.update(k for k in SCHEMA_KEYS if k in props)
+    return found
+
+def schema_from_keys(keys):
     # Required (from your example file)
-    prop_keys = {
-        "MUNI_NAME": "MUNI_NAME" if "MUNI_NAME" in keys else None,
-        "MUNI_STATU": "MUNI_STATU" if "MUNI_STATU" in keys else None,
-        "population_2021": "population_2021" if "population_2021" in keys else None,
-        "name": "name" if "name" in keys else None,
-        "status": "status" if "status" in keys else None,
-    }
-    return prop_keys
-
-def already_has_winnipeg(features):
-    for f in features:
-        props = f.get("properties", {})
-        n1 = str(props.get("MUNI_NAME", "")).strip().lower()
-        n2 = str(props.get("name", "")).strip().lower()
-        if n1 == WINNIPEG_NAME.lower() or n2 == WINNIPEG_NAME.lower():
-            return True
-    return False
+    return {k: (k if k in keys else None) for k in SCHEMA_KEYS}
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--in", dest="in_path", required=True, help="Input GeoJSON path")
-    ap.add_argument("--out", dest="out_path", required=True, help="Output GeoJSON path")
-    ap.add_argument("--simplify", type=float, default=0.0,
-                    help="Optional simplification tolerance in degrees (e.g., 0.0005). Default=0 (no simplify).")
-    args = ap.parse_args()
-
-    data = load_geojson(args.in_path)
-    features = data.get("features", [])
-
-    if already_has_winnipeg(features):
-        print("Winnipeg already present; writing a copy to the --out path without changes.")
-        with open(args.out_path, "w", encoding="utf-8") as f:
-            json.dump(data, f)
-        return
-
-    print("Fetching Winnipeg boundary from OpenStreetMap…")
-    geom = get_winnipeg_boundary()
-    if args.simplify and args.simplify > 0:
-        try:
-            geom = geom.simplify(args.simplify, preserve_topology=True)
-        except Exception as e:
-            print(f"Warning: simplify failed ({e}); using original geometry.")
+def is_winnipeg(props):
+    n1 = str(props.get("MUNI_NAME", "")).strip().lower()
+    n2 = str(props.get("name", "")).strip().lower()
+    return n1 == WINNIPEG_NAME.lower() or n2 == WINNIPEG_NAME.lower()
 
-    # Mirror the existing property schema
-    schema = detect_property_schema(features)
+def build_winnipeg_feature(schema, geom):
     props = {}
     # Fill properties that exist in your file
     if schema["MUNI_NAME"]:        props[schema["MUNI_NAME"]] = WINNIPEG_NAME
@@ -101,48 +146,108 @@ def main():
     if schema["population_2021"]:  props[schema["population_2021"]] = WINNIPEG_POP_2021
     if schema["name"]:             props[schema["name"]] = WINNIPEG_NAME
     if schema["status"]:           props[schema["status"]] = WINNIPEG_STATUS
-
-    # Build the new feature
-    new_feature = {
+    return {
         "type": "Feature",
         "properties": props,
         "geometry": mapping(geom)  # GeoJSON-ready dict
     }
 
-    # Append and write
-    data["features"].append(new_feature)
+def fetch_boundary(simplify, refresh=False):
+    if refresh or not BOUNDARY_CACHE.exists():
+        print("Fetching Winnipeg boundary from OpenStreetMap…")
+    else:
+        print(f"Using cached Winnipeg boundary from {BOUNDARY_CACHE} (--refresh-boundary to re-fetch).")
+    geom = get_winnipeg_boundary(refresh)
+    if simplify and simplify > 0:
+        try:
+            geom = shapely.simplify(geom, simplify, preserve_topology=True)
+        except Exception as e:
+            print(f"Warning: simplify failed ({e}); using original geometry.")
+    return geom
+
+def stream_append_winnipeg(in_path, out_path, simplify=DEFAULT_SIMPLIFY, refresh_boundary=False):
+    """
+    Append Winnipeg to the input FeatureCollection, writing the result to out_path.
+    A cheap pre-check (probe_has_winnipeg) runs first: if Winnipeg is already
+    present the input is copied byte for byte, without parsing it further or
+    fetching the boundary. Otherwise features are streamed through one at a
+    time (memory use is O(1 feature)), detecting the property schema on the
+    way, while the boundary is fetched in the background, and Winnipeg is
+    appended at the end. Top-level members that come before "features" (e.g.
+    "crs") are carried over.
+
+    If out_path ends in ".ndjson" the output is newline-delimited instead: a
+    first line holding the top-level members, then one feature per line (an
+    input that already has Winnipeg is converted without appending).
+
+    Returns "appended", "copied" (Winnipeg present, input copied unchanged) or
+    "converted" (Winnipeg present, input rewritten as NDJSON).
+    """
+    header = read_header(in_path)
+    ndjson = str(out_path).endswith(".ndjson")
+    has_winnipeg = probe_has_winnipeg(in_path)
+    if has_winnipeg and not ndjson:
+        shutil.copyfile(in_path, out_path)
+        return "copied"
+    if ndjson:
+        # Metadata line, then one feature per line
+        opening, sep, closing = dumps_feature(header) + b"\n", b"\n", b"\n"
+    else:
+        # Re-emit the header members, then open the features array
+        opening, sep, closing = dumps_feature(header)[:-1] + b',"features":[', b",", b"]}"
+    keys = set()
+    tmp_path = f"{out_path}.tmp"
+    # Winnipeg is known to be missing at this point, so the fetch (or cached
+    # load) is always needed; run it in the background during the copy pass
+    ex = ThreadPoolExecutor(max_workers=1)
+    geom_fut = None if has_winnipeg else ex.submit(fetch_boundary, simplify, refresh_boundary)
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(opening)
+            first = True
+            for feat in iter_features(in_path):
+                collect_schema_keys(feat.get("properties") or {}, keys)
+                if not first:
+                    out.write(sep)
+                out.write(dumps_feature(feat))
+                first = False
+            if not has_winnipeg:
+                new_feature = build_winnipeg_feature(schema_from_keys(keys), geom_fut.result())
+                if not first:
+                    out.write(sep)
+                out.write(dumps_feature(new_feature))
+            out.write(closing)
+        os.replace(tmp_path, out_path)
+    finally:
+        ex.shutdown(cancel_futures=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return "converted" if has_winnipeg else "appended"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_path", default=DEFAULT_IN_PATH,
+                    help=f"Input GeoJSON path (default: {DEFAULT_IN_PATH})")
+    ap.add_argument("--out", dest="out_path", default=DEFAULT_OUT_PATH,
+                    help=f"Output GeoJSON path (default: {DEFAULT_OUT_PATH}); "
+                         "use a .ndjson extension for one feature per line")
+    ap.add_argument("--simplify", type=float, default=DEFAULT_SIMPLIFY,
+                    help=f"Simplification tolerance in degrees for the display geometry. "
+                         f"Default={DEFAULT_SIMPLIFY} (~10 m); 0 keeps the full OSM boundary.")
+    ap.add_argument("--refresh-boundary", action="store_true",
+                    help=f"Re-fetch the Winnipeg boundary from OSM instead of using {BOUNDARY_CACHE}.")
+    args = ap.parse_args()
 
-    # Optional: ensure CRS metadata if present originally
-    # (Most simple FeatureCollections omit "crs", which is fine for WGS84)
     out_dir = Path(args.out_path).parent
     out_dir.mkdir(parents=True, exist_ok=True)
-    with open(args.out_path, "w", encoding="utf-8") as f:
-        json.dump(data, f)
 
-    print(f"Done. Appended Winnipeg to GeoJSON -> {args.out_path}")
+    outcome = stream_append_winnipeg(args.in_path, args.out_path, args.simplify, args.refresh_boundary)
+    if outcome == "appended":
+        print(f"Done. Appended Winnipeg to GeoJSON -> {args.out_path}")
+    elif outcome == "converted":
+        print(f"Winnipeg already present; converted to NDJSON without changes -> {args.out_path}")
+    else:
+        print("Winnipeg already present; wrote a copy to the --out path without changes.")
 
 if __name__ == "__main__":
-    in_path = "data/mb_10_munis_with_pop.geojson"
-    out_path = "data/mb_with_winnipeg.geojson"
-
-    data = load_geojson(in_path)
-    features = data.get("features", [])
-
-    if already_has_winnipeg(features):
-        print("Winnipeg already present; writing copy without changes.")
-    else:
-        geom = get_winnipeg_boundary()
-        schema = detect_property_schema(features)
-        props = {
-            schema["MUNI_NAME"]: "Winnipeg",
-            schema["MUNI_STATU"]: "City",
-            schema["population_2021"]: 749_607,
-            schema["name"]: "Winnipeg",
-            schema["status"]: "City",
-        }
-        new_feature = {"type": "Feature", "properties": props, "geometry": mapping(geom)}
-        data["features"].append(new_feature)
-
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(data, f)
-    print(f"✅ Done. File saved to {out_path}")
+    main()
@@ -2,17 +2,83 @@
 Utility functions for the Manitoba Incidents Streamlit app.
 
 This module centralizes helper logic for:
+  • JSON/GeoJSON file loading (orjson when available)
   • Geometry handling (bounds, centroid, coordinate iteration)
   • Incident parsing & filtering
   • Styling and icons (including loading SVGs for markers)
   • Municipality property normalization and filters
 """
 from __future__ import annotations
+import base64
 import json
 import os
-from typing import Dict, Any, Iterable, Iterator, List, Tuple, Optional
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Tuple, Optional
 
 import folium
+import numpy as np
+import shapely
+from shapely.geometry import Point, shape
+from shapely.strtree import STRtree
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    orjson = None
+
+# -------------------------- I/O helpers --------------------------
+
+def load_json(path: str) -> Any:
+    """
+    Read and parse a JSON/GeoJSON file, using orjson when it is installed.
+
+    Parameters
+    ----------
+    path : str
+        Path to the JSON file.
+
+    Returns
+    -------
+    Any
+        The parsed document.
+    """
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def loads_json(raw: bytes | str) -> Any:
+    """
+    Parse a JSON document from bytes or str, using orjson when it is installed.
+
+    Both parsers raise a json.JSONDecodeError subclass on malformed input.
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps_json(obj: Any, indent: bool = False) -> bytes:
+    """
+    Serialize obj to UTF-8 encoded JSON bytes, using orjson when it is installed.
+
+    Parameters
+    ----------
+    obj : Any
+        JSON-serializable object.
+    indent : bool
+        Pretty-print with two-space indentation.
+
+    Returns
+    -------
+    bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
 
 # -------------------------- Geometry helpers --------------------------
 
@@ -20,6 +86,9 @@ def iter_coords(geom: Dict[str, Any]) -> Iterator[Tuple[float, float]]:
     """
     Yield (lon, lat) coordinate pairs from a GeoJSON Polygon or MultiPolygon geometry.
 
+    Legacy per-vertex API, kept for existing callers. New code should prefer
+    shapely.get_coordinates, which returns all vertices as one NumPy array.
+
     Parameters
     ----------
     geom : dict
@@ -57,23 +126,27 @@ def get_bounds(features: Iterable[Dict[str, Any]]) -> List[List[float]]:
     list
         [[south, west], [north, east]] suitable for folium.fit_bounds.
     """
-    xs, ys = [], []
+    geoms = []
     for feat in features:
-        geom = feat.get("geometry", {})
-        if not geom:
+        geom = feat.get("geometry") or {}
+        if geom.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        try:
+            geoms.append(shape(geom))
+        except (ValueError, TypeError, AttributeError):
             continue
-        for x, y in iter_coords(geom):
-            xs.append(x); ys.append(y)
-    if not xs:
+    # All vertices as one (N, 2) array of (lon, lat) from a single GEOS call
+    coords = shapely.get_coordinates(np.asarray(geoms, dtype=object))
+    if coords.shape[0] == 0:
         # Fallback: approximate bounds for Manitoba
         return [[48.0, -102.0], [60.5, -88.0]]
-    return [[min(ys), min(xs)], [max(ys), max(xs)]]
+    (west, south), (east, north) = coords.min(axis=0).tolist(), coords.max(axis=0).tolist()
+    return [[south, west], [north, east]]
 
 
 def centroid_of_feature(feature: Dict[str, Any]) -> Tuple[float, float]:
     """
-    Approximate centroid (lat, lon) for a polygon feature by averaging coordinates.
-    For large or complex polygons, consider using shapely for accuracy.
+    Area-weighted centroid (lat, lon) of a polygon feature, computed by GEOS.
 
     Parameters
     ----------
@@ -83,14 +156,20 @@ def centroid_of_feature(feature: Dict[str, Any]) -> Tuple[float, float]:
     Returns
     -------
     (lat, lon) : tuple of float
+        Falls back to central Manitoba (50.0, -97.0) for missing, empty or
+        malformed geometries.
     """
-    xs, ys = [], []
-    geom = feature.get("geometry", {})
-    for x, y in iter_coords(geom):
-        xs.append(x); ys.append(y)
-    if xs:
-        return (sum(ys)/len(ys), sum(xs)/len(xs))
-    return (50.0, -97.0)
+    geom = feature.get("geometry")
+    if not geom:
+        return (50.0, -97.0)
+    try:
+        g = shape(geom)
+    except (ValueError, TypeError, AttributeError):
+        return (50.0, -97.0)
+    if g.is_empty:
+        return (50.0, -97.0)
+    c = g.centroid
+    return (c.y, c.x)
 
 
 # -------------------------- Incident helpers --------------------------
@@ -114,37 +193,62 @@ def split_incidents(incidents_data: Dict[str, Any], status_filter: List[str]) ->
     """
     wf_features: List[Dict[str, Any]] = []
     fl_features: List[Dict[str, Any]] = []
+    allowed = frozenset(status_filter)
 
     if isinstance(incidents_data, dict) and incidents_data.get("type") == "FeatureCollection":
         for feat in incidents_data.get("features", []):
             props = feat.get("properties", {})
-            t = props.get("type")
-            stat = props.get("status")
-            if stat not in status_filter:
+            if props.get("status") not in allowed:
                 continue
+            t = props.get("type")
             if t == "wildfire":
                 wf_features.append(feat)
             elif t == "flood":
                 fl_features.append(feat)
     else:
         # fallback for custom structure
-        for inc in incidents_data.get("wildfires", []):
-            if inc.get("status") in status_filter:
-                wf_features.append({
-                    "type": "Feature",
-                    "properties": {k: v for k, v in inc.items() if k != "coordinates"} | {"type": "wildfire"},
-                    "geometry": {"type": "Polygon", "coordinates": [inc["coordinates"]]}
-                })
-        for inc in incidents_data.get("floods", []):
-            if inc.get("status") in status_filter:
-                fl_features.append({
-                    "type": "Feature",
-                    "properties": {k: v for k, v in inc.items() if k != "coordinates"} | {"type": "flood"},
-                    "geometry": {"type": "Polygon", "coordinates": [inc["coordinates"]]}
-                })
+        wf_features = [_to_feature(inc, "wildfire") for inc in incidents_data.get("wildfires", [])
+                       if inc.get("status") in allowed]
+        fl_features = [_to_feature(inc, "flood") for inc in incidents_data.get("floods", [])
+                       if inc.get("status") in allowed]
     return wf_features, fl_features
 
 
+def _to_feature(inc: Dict[str, Any], kind: str) -> Dict[str, Any]:
+    """
+    Convert a custom-format incident ({..., 'coordinates': ring}) into a GeoJSON
+    Polygon Feature of the given kind, without mutating the input.
+    """
+    props = inc.copy()
+    coords = props.pop("coordinates")
+    props["type"] = kind
+    return {"type": "Feature", "properties": props,
+            "geometry": {"type": "Polygon", "coordinates": [coords]}}
+
+
+@lru_cache(maxsize=4096)
+def parse_iso(timestamp: str) -> datetime:
+    """
+    Parse an ISO-8601 timestamp, accepting a trailing 'Z' for UTC.
+    Memoized per string for the lifetime of the process.
+    """
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+
+@lru_cache(maxsize=4096)
+def format_started_at(timestamp: str) -> str:
+    """
+    Format an ISO-8601 timestamp as 'YYYY-MM-DD HH:MM' for display (memoized).
+    """
+    return parse_iso(timestamp).strftime('%Y-%m-%d %H:%M')
+
+
+# Style dicts shared across features, keyed by (type, status) and lowercased
+# municipality status respectively; only a handful of distinct styles exist.
+_STYLE_CACHE: Dict[Tuple[Any, Any], Dict[str, Any]] = {}
+_MUNI_STYLE_CACHE: Dict[str, Dict[str, Any]] = {}
+
+
 def style_for_feature(props: Dict[str, Any]) -> Dict[str, Any]:
     """
     Return a folium style dict for an incident polygon based on type and status.
@@ -152,27 +256,48 @@ def style_for_feature(props: Dict[str, Any]) -> Dict[str, Any]:
     Colors follow:
       - Wildfire: red shades (#d73027 confirmed, #fc8d59 suspected)
       - Flood: blue/teal (#2c7fb8 confirmed, #7fcdbb suspected)
+
+    The returned dict is shared between all features with the same
+    (type, status) and must not be mutated.
     """
     kind = props.get('type')
     conf = props.get('status') or props.get('confidence')
-    if kind == 'wildfire':
-        color = '#d73027' if conf == 'confirmed' else '#fc8d59'
-    else:
-        color = '#2c7fb8' if conf == 'confirmed' else '#7fcdbb'
-    return {'color': color, 'weight': 2, 'fillColor': color, 'fillOpacity': 0.25}
+    style = _STYLE_CACHE.get((kind, conf))
+    if style is None:
+        if kind == 'wildfire':
+            color = '#d73027' if conf == 'confirmed' else '#fc8d59'
+        else:
+            color = '#2c7fb8' if conf == 'confirmed' else '#7fcdbb'
+        style = _STYLE_CACHE.setdefault((kind, conf), {'color': color, 'weight': 2, 'fillColor': color, 'fillOpacity': 0.25})
+    return style
 
 
 def make_muni_style(feature: Dict[str, Any]) -> Dict[str, Any]:
     """
     Style function for municipality polygons based on status (city/town).
+    Returns a shared (read-only) dict per status.
     """
     status = (feature.get("properties", {}).get("status", "") or "").lower()
-    color = "#3b82f6" if status == "city" else "#10b981" if status == "town" else "#64748b"
-    return {"fillOpacity": 0.35, "weight": 2, "color": color}
+    style = _MUNI_STYLE_CACHE.get(status)
+    if style is None:
+        color = "#3b82f6" if status == "city" else "#10b981" if status == "town" else "#64748b"
+        style = _MUNI_STYLE_CACHE.setdefault(status, {"fillOpacity": 0.35, "weight": 2, "color": color})
+    return style
 
 
 # -------------------------- Icon helpers --------------------------
 
+@lru_cache(maxsize=32)
+def _load_svg_data_uri(path: str) -> str:
+    """
+    Read an SVG file once and return it as a base64 data URI. Cached per path,
+    so repeated icon construction only allocates the CustomIcon wrapper.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    return (b"data:image/svg+xml;base64," + base64.b64encode(raw)).decode("ascii")
+
+
 def load_svg_icon(path: str, size: Tuple[int, int] = (30, 30)) -> Optional[folium.CustomIcon]:
     """
     Load an SVG file and return a folium.CustomIcon. If the file is missing,
@@ -192,11 +317,7 @@ def load_svg_icon(path: str, size: Tuple[int, int] = (30, 30)) -> Optional[foliu
     if not path or not os.path.exists(path):
         return None
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            svg = f.read()
-        import base64
-        uri = "data:image/svg+xml;base64," + base64.b64encode(svg.encode("utf-8")).decode("ascii")
-        return folium.CustomIcon(icon_image=uri, icon_size=size)
+        return folium.CustomIcon(icon_image=_load_svg_data_uri(path), icon_size=size)
     except Exception:
         return None
 
@@ -236,17 +357,21 @@ def icon_for_feature(props: Dict[str, Any], fire_icon: Optional[folium.CustomIco
 
 # -------------------------- Municipality helpers --------------------------
 
+# (normalized key, source key) pairs applied by normalize_muni_properties
+MUNI_PROPERTY_ALIASES = (("name", "MUNI_NAME"), ("status", "MUNI_STATU"))
+
+
 def normalize_muni_properties(muni_feats: List[Dict[str, Any]]) -> None:
     """
     Normalize common property names for municipality features in-place.
     Adds 'name' and 'status' if only 'MUNI_NAME'/'MUNI_STATU' exist.
+    Every feature must carry a 'properties' dict (true for the bundled files).
     """
     for f in muni_feats:
-        p = f.setdefault("properties", {})
-        if "name" not in p and "MUNI_NAME" in p:
-            p["name"] = p["MUNI_NAME"]
-        if "status" not in p and "MUNI_STATU" in p:
-            p["status"] = p["MUNI_STATU"]
+        p = f["properties"]
+        for dst, src in MUNI_PROPERTY_ALIASES:
+            if dst not in p and src in p:
+                p[dst] = p[src]
 
 
 def muni_passes(f: Dict[str, Any], sel_status: List[str], sel_pop: Tuple[int, int]) -> bool:
@@ -267,3 +392,97 @@ def muni_passes(f: Dict[str, Any], sel_status: List[str], sel_pop: Tuple[int, in
         return False
     pv = p.get("population_2021")
     return isinstance(pv, (int, float)) and sel_pop[0] <= pv <= sel_pop[1]
+
+
+def make_muni_filter(sel_status: Iterable[str], sel_pop: Tuple[int, int]) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Return a predicate equivalent to muni_passes(f, sel_status, sel_pop), with the
+    status set and population bounds bound once instead of per feature.
+
+    Use as ``keep = make_muni_filter(sel_status, sel_pop)`` followed by
+    ``[f for f in muni_feats if keep(f)]``.
+    """
+    allowed = frozenset(sel_status)
+    lo, hi = sel_pop
+
+    def pred(f: Dict[str, Any]) -> bool:
+        p = f.get("properties", {})
+        if p.get("status", "Unknown") not in allowed:
+            return False
+        pv = p.get("population_2021")
+        return type(pv) in (int, float) and lo <= pv <= hi
+
+    return pred
+
+
+def build_muni_index(features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Flatten municipality features into column arrays for vectorized filtering.
+
+    Parameters
+    ----------
+    features : list of dict
+        Normalized municipality features (see normalize_muni_properties).
+
+    Returns
+    -------
+    dict
+        {"status": object array of statuses ("Unknown" if missing),
+         "pop": float64 array of 2021 populations (NaN if not numeric),
+         "features": the input list, aligned with both arrays}.
+    """
+    statuses, pops = [], []
+    for f in features:
+        p = f.get("properties", {})
+        statuses.append(p.get("status", "Unknown"))
+        pv = p.get("population_2021")
+        pops.append(pv if isinstance(pv, (int, float)) else np.nan)
+    return {
+        "status": np.array(statuses, dtype=object),
+        "pop": np.array(pops, dtype=np.float64),
+        "features": features,
+    }
+
+
+def muni_filter_mask(index: Dict[str, Any], sel_status: List[str], sel_pop: Tuple[int, int]) -> np.ndarray:
+    """
+    Vectorized muni_passes over a build_muni_index result.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask aligned with index["features"]. NaN populations never pass.
+    """
+    pop = index["pop"]
+    return np.isin(index["status"], list(sel_status)) & (pop >= sel_pop[0]) & (pop <= sel_pop[1])
+
+
+def build_muni_tree(muni_feats: List[Dict[str, Any]]) -> Tuple[STRtree, np.ndarray]:
+    """
+    Build a spatial index over municipality geometries for point queries.
+
+    Parameters
+    ----------
+    muni_feats : list of dict
+        Municipality features.
+
+    Returns
+    -------
+    (tree, geoms)
+        A shapely STRtree and the object array of shapely geometries it indexes,
+        aligned with muni_feats (None for features without geometry). The
+        geometries are prepared (shapely.prepare), so repeated intersects/contains
+        checks against them reuse GEOS' prepared-geometry index; shapely 2
+        geometries are immutable, so the preparation stays valid.
+    """
+    geoms = np.array([shape(f["geometry"]) if f.get("geometry") else None for f in muni_feats], dtype=object)
+    shapely.prepare(geoms)
+    return STRtree(geoms), geoms
+
+
+def munis_at_point(tree: STRtree, lat: float, lon: float) -> np.ndarray:
+    """
+    Return the indices (into the features given to build_muni_tree) of the
+    municipalities whose geometry intersects the point (lat, lon).
+    """
+    return tree.query(Point(lon, lat), predicate="intersects")